@@ -1,9 +1,184 @@
 # cloud_interface.py
+import functools
+import logging
 import os
 import shutil
+import textwrap
 import time
+import types
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
 
+log = logging.getLogger(__name__)
+
+# 插件脚本类型（元数据中 "script_type" 字段的取值）
+SCRIPT_TYPE_PY = "py"
+SCRIPT_TYPE_SH = "sh"
+
+_IS_POSIX = os.name != 'nt'
+
+# 示例插件源码（模块级常量，首次需要时才写入磁盘）
+_HELLO_WORLD_SRC = (
+    "print('Hello from Python Plugin!')\n"
+    "import sys\n"
+    "print(f'Python version: {sys.version_info.major}.{sys.version_info.minor}')\n"
+)
+
+_LIST_FILES_SRC = (
+    "#!/bin/bash\n"
+    "echo 'Listing files in current directory (from Shell Plugin):'\n"
+    "ls -la\n"
+)
+
+# ---- 新增：带参数和输入的Python脚本 ----
+_PROCESS_DATA_SRC = textwrap.dedent("""
+    import sys
+    import argparse
+    import time
+    
+    print("Process Data Plugin Started.")
+    print(f"Arguments received: {sys.argv[1:]}")
+    
+    parser = argparse.ArgumentParser(description="Processes some data.")
+    parser.add_argument("--input-file", required=True, help="Path to the input data file.")
+    parser.add_argument("--output-file", default="output.txt", help="Path to save the output.")
+    parser.add_argument("--iterations", type=int, default=1, help="Number of processing iterations.")
+    
+    try:
+        args = parser.parse_args() # sys.argv[1:] is used by default
+    
+        print(f"Processing input file: {args.input_file}")
+        print(f"Output will be saved to: {args.output_file}")
+        print(f"Number of iterations: {args.iterations}")
+    
+        for i in range(args.iterations):
+            print(f"Iteration {i+1}/{args.iterations}...")
+            # Simulate work
+            time.sleep(0.5)
+    
+        # 尝试从标准输入读取一行（如果主程序关闭了stdin，这里会快速返回或出错）
+        try:
+            print("\\nAttempting to read a line from stdin (e.g., for a confirmation):")
+            user_confirmation = input("Type something and press Enter (will likely be EOF): ")
+            if user_confirmation: # Will be empty if stdin was closed
+                print(f"Stdin read: '{user_confirmation}'")
+            else:
+                print("Stdin was empty (EOF received as expected).")
+        except EOFError:
+            print("EOFError received when trying to read from stdin (as expected if stdin is closed).")
+        except Exception as e_input:
+            print(f"Error reading from stdin: {e_input}")
+    
+    
+        with open(args.output_file, "w") as outfile:
+            outfile.write(f"Processed {args.input_file} with {args.iterations} iterations.\\n")
+            outfile.write("This is a dummy output file from process_data.py plugin.\\n")
+    
+        print(f"Successfully processed and saved to {args.output_file}")
+    
+    except SystemExit: # Argparse calls sys.exit on --help or error
+        print("Argparse exited (e.g. due to --help or invalid arguments).")
+        # Depending on desired behavior, you might want to reraise or exit with a specific code
+        # For this example, we'll let it complete so the user sees the help message.
+    except Exception as e:
+        print(f"Error in process_data.py: {e}")
+        sys.exit(1) # Indicate failure
+    
+    print("Process Data Plugin Finished.")
+    """).lstrip("\n")
+# ---- 结束新增 ----
+
+# 导入时统一编码为 UTF-8 字节，写盘时一次 write() 完成，不受本地默认编码/换行符影响
+_SAMPLE_SOURCES = {
+    "hello_world.py": _HELLO_WORLD_SRC.encode("utf-8"),
+    "list_files.sh": _LIST_FILES_SRC.encode("utf-8"),
+    "process_data.py": _PROCESS_DATA_SRC.encode("utf-8"),
+}
+
+# 导入时编译一次 Python 示例源码，源码有语法/缩进错误时立即失败，而不是每次运行插件时才报错
+for _name, _src in _SAMPLE_SOURCES.items():
+    if _name.endswith(".py"):
+        compile(_src, _name, "exec")
+del _name, _src
+
+
+@functools.lru_cache(maxsize=None)
+def _plugins_metadata(sample_plugin_dir):
+    """
+    模拟云端的插件元数据；每个 sample_plugin_dir 只构建一次，各实例共享。
+    元素及其中的 expected_args 都是只读的（见 _freeze_plugin_data），防止某个调用方修改共享缓存。
+    """
+    return tuple(_freeze_plugin_data(plugin_data) for plugin_data in (
+        {
+            "id": "py_hello_001", "name": "Hello World (Python)",
+            "description": "一个简单的Python插件，打印 'Hello from Python Plugin!' 和Python版本。",
+            "version": "1.0", "author": "Test User", "script_type": SCRIPT_TYPE_PY,
+            "script_filename": "hello_world.py",
+            "download_url": f"simulated://{sample_plugin_dir}/hello_world.py",
+            "expected_args": []  # No arguments for this one
+        },
+        {
+            "id": "sh_ls_002", "name": "List Files (Shell)",
+            "description": "一个简单的Shell插件，列出当前目录的文件。",
+            "version": "1.0", "author": "Test User", "script_type": SCRIPT_TYPE_SH,
+            "script_filename": "list_files.sh",
+            "download_url": f"simulated://{sample_plugin_dir}/list_files.sh",
+            "expected_args": [  # Shell script can also take args
+                {"name": "path_to_list", "type": "str",
+                 "description": "Optional path to list (default: current dir)", "required": False}
+            ]
+        },
+        # ---- 新增插件元数据 ----
+        {
+            "id": "py_process_data_003", "name": "Process Data (Python)",
+            "description": "一个处理数据并尝试从stdin读取的Python插件。",
+            "version": "1.1", "author": "AI Assistant", "script_type": SCRIPT_TYPE_PY,
+            "script_filename": "process_data.py",
+            "download_url": f"simulated://{sample_plugin_dir}/process_data.py",
+            "expected_args": [
+                {"name": "input-file", "type": "str", "description": "Input data file path", "required": True},
+                {"name": "output-file", "type": "str", "description": "Output file path (default: output.txt)",
+                 "required": False, "default": "output.txt"},
+                {"name": "iterations", "type": "int", "description": "Number of iterations (default: 1)",
+                 "required": False, "default": "1"}
+            ]
+        }
+        # ---- 结束新增 ----
+    ))
+
+
+def _freeze_plugin_data(plugin_data):
+    """返回只读视图：顶层为 MappingProxyType，expected_args 转为由 MappingProxyType 组成的元组。"""
+    plugin_data = dict(plugin_data)
+    plugin_data["expected_args"] = tuple(types.MappingProxyType(dict(arg_def))
+                                         for arg_def in plugin_data.get("expected_args") or ())
+    return types.MappingProxyType(plugin_data)
+
+
+def _copy_script(source_path, dest_path):
+    """
+    复制脚本文件内容（不复制权限位，shell 脚本的可执行权限由调用方按需设置）。
+    Linux 上优先用 os.copy_file_range 在内核态完成复制，不支持时回退到 shutil.copyfile。
+    """
+    if os.path.exists(dest_path) and os.path.samefile(source_path, dest_path):
+        # 与 shutil.copy 行为一致；否则以 "wb" 打开目标会先把源文件截断
+        raise shutil.SameFileError(f"{source_path!r} and {dest_path!r} are the same file")
+    copied = False
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(source_path, "rb") as src, open(dest_path, "wb") as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    n = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if n == 0:
+                        break
+                    remaining -= n
+                copied = remaining == 0
+        except OSError:
+            copied = False  # 例如跨文件系统或内核不支持，交给下面的通用路径
+    if not copied:
+        shutil.copyfile(source_path, dest_path)
+
 
 class ICloudConnector(ABC):
     """
@@ -41,163 +216,169 @@ class ICloudConnector(ABC):
         """
         pass
 
+    def iter_plugins(self, predicate=None):
+        """
+        逐个产出云端插件元数据，可用 predicate 过滤。
+        调用方可以提前停止，例如: next(connector.iter_plugins(lambda p: p['id'] == wanted_id), None)
+        """
+        plugin_list = self.fetch_plugin_list()
+        if plugin_list is None:
+            return
+        for plugin_data in plugin_list:
+            if predicate is None or predicate(plugin_data):
+                yield plugin_data
+
+    def download_plugins_batch(self, infos_and_paths, max_workers=4):
+        """
+        并发下载多个插件脚本。
+        :param infos_and_paths: (plugin_info, local_save_path) 元组的可迭代对象
+        :param max_workers: 最大并发数
+        :return: 与输入顺序一致的 True/False 列表
+        """
+        infos_and_paths = list(infos_and_paths)
+        if not infos_and_paths:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(infos_and_paths))) as executor:
+            return list(executor.map(lambda pair: self.download_plugin_script(*pair), infos_and_paths))
+
 
 class MockCloudConnector(ICloudConnector):
     def __init__(self, sample_plugin_dir="sample_plugins_for_cloud"):
         self.sample_plugin_dir = sample_plugin_dir
-        # ... (确保目录和基础脚本创建) ...
-        if not os.path.exists(self.sample_plugin_dir):
-            os.makedirs(self.sample_plugin_dir)
-            # 创建示例插件
-            with open(os.path.join(self.sample_plugin_dir, "hello_world.py"), "w") as f:
-                f.write("print('Hello from Python Plugin!')\n")
-                f.write("import sys\n")
-                f.write("print(f'Python version: {sys.version_info.major}.{sys.version_info.minor}')\n")
-
-            with open(os.path.join(self.sample_plugin_dir, "list_files.sh"), "w") as f:
-                f.write("#!/bin/bash\n")
-                f.write("echo 'Listing files in current directory (from Shell Plugin):'\n")
-                f.write("ls -la\n")
-            if os.name != 'nt':
-                os.chmod(os.path.join(self.sample_plugin_dir, "list_files.sh"), 0o755)
-
-            # ---- 新增：带参数和输入的Python脚本 ----
-            with open(os.path.join(self.sample_plugin_dir, "process_data.py"), "w") as f_proc:
-                f_proc.write(
-                    """
-                    import sys
-                    import argparse
-                    import time
-                    
-                    print("Process Data Plugin Started.")
-                    print(f"Arguments received: {sys.argv[1:]}")
-                    
-                    parser = argparse.ArgumentParser(description="Processes some data.")
-                    parser.add_argument("--input-file", required=True, help="Path to the input data file.")
-                    parser.add_argument("--output-file", default="output.txt", help="Path to save the output.")
-                    parser.add_argument("--iterations", type=int, default=1, help="Number of processing iterations.")
-                    
-                    try:
-                        args = parser.parse_args() # sys.argv[1:] is used by default
-                    
-                        print(f"Processing input file: {args.input_file}")
-                        print(f"Output will be saved to: {args.output_file}")
-                        print(f"Number of iterations: {args.iterations}")
-                    
-                        for i in range(args.iterations):
-                            print(f"Iteration {i+1}/{args.iterations}...")
-                            # Simulate work
-                            time.sleep(0.5)
-                    
-                        # 尝试从标准输入读取一行（如果主程序关闭了stdin，这里会快速返回或出错）
-                        try:
-                            print("\\nAttempting to read a line from stdin (e.g., for a confirmation):")
-                            user_confirmation = input("Type something and press Enter (will likely be EOF): ")
-                            if user_confirmation: # Will be empty if stdin was closed
-                                print(f"Stdin read: '{user_confirmation}'")
-                            else:
-                                print("Stdin was empty (EOF received as expected).")
-                        except EOFError:
-                            print("EOFError received when trying to read from stdin (as expected if stdin is closed).")
-                        except Exception as e_input:
-                            print(f"Error reading from stdin: {e_input}")
-                    
-                    
-                        with open(args.output_file, "w") as outfile:
-                            outfile.write(f"Processed {args.input_file} with {args.iterations} iterations.\\n")
-                            outfile.write("This is a dummy output file from process_data.py plugin.\\n")
-                    
-                        print(f"Successfully processed and saved to {args.output_file}")
-                    
-                    except SystemExit: # Argparse calls sys.exit on --help or error
-                        print("Argparse exited (e.g. due to --help or invalid arguments).")
-                        # Depending on desired behavior, you might want to reraise or exit with a specific code
-                        # For this example, we'll let it complete so the user sees the help message.
-                    except Exception as e:
-                        print(f"Error in process_data.py: {e}")
-                        sys.exit(1) # Indicate failure
-                    
-                    print("Process Data Plugin Finished.")
-                    """
-                )
-            # ---- 结束新增 ----
-
-        self.plugins_metadata = [
-            {
-                "id": "py_hello_001", "name": "Hello World (Python)",
-                "description": "一个简单的Python插件，打印 'Hello from Python Plugin!' 和Python版本。",
-                "version": "1.0", "author": "Test User", "script_type": "py",
-                "script_filename": "hello_world.py",
-                "download_url": f"simulated://{self.sample_plugin_dir}/hello_world.py",
-                "expected_args": []  # No arguments for this one
-            },
-            {
-                "id": "sh_ls_002", "name": "List Files (Shell)",
-                "description": "一个简单的Shell插件，列出当前目录的文件。",
-                "version": "1.0", "author": "Test User", "script_type": "sh",
-                "script_filename": "list_files.sh",
-                "download_url": f"simulated://{self.sample_plugin_dir}/list_files.sh",
-                "expected_args": [  # Shell script can also take args
-                    {"name": "path_to_list", "type": "str",
-                     "description": "Optional path to list (default: current dir)", "required": False}
-                ]
-            },
-            # ---- 新增插件元数据 ----
-            {
-                "id": "py_process_data_003", "name": "Process Data (Python)",
-                "description": "一个处理数据并尝试从stdin读取的Python插件。",
-                "version": "1.1", "author": "AI Assistant", "script_type": "py",
-                "script_filename": "process_data.py",
-                "download_url": f"simulated://{self.sample_plugin_dir}/process_data.py",
-                "expected_args": [
-                    {"name": "input-file", "type": "str", "description": "Input data file path", "required": True},
-                    {"name": "output-file", "type": "str", "description": "Output file path (default: output.txt)",
-                     "required": False, "default": "output.txt"},
-                    {"name": "iterations", "type": "int", "description": "Number of iterations (default: 1)",
-                     "required": False, "default": "1"}
-                ]
-            }
-            # ---- 结束新增 ----
-        ]
+        self._sample_sources = _SAMPLE_SOURCES  # 示例脚本延迟到首次下载时才写入磁盘
+        self._source_paths = {name: os.path.join(self.sample_plugin_dir, name) for name in self._sample_sources}
+
+        self.plugins_metadata = _plugins_metadata(self.sample_plugin_dir)
+        self._plugin_list_cache = None  # fetch_plugin_list 的缓存，invalidate() 后重建
+        self._source_files = set()  # sample_plugin_dir 中已存在的文件名快照
+        self._ensured_dirs = set()  # 已确认存在的目录，避免每次下载都 makedirs
+        self._download_cache = {}  # (download_url, version) -> (local_save_path, st_size, st_mtime_ns)
+        self.refresh_sources()
 
     # ... (fetch_plugin_list and download_plugin_script methods remain the same) ...
     def fetch_plugin_list(self):
-        print("MockCloudConnector: Fetching plugin list...")
-        # time.sleep(0.5) # Simulate network delay
-        return self.plugins_metadata
+        if self._plugin_list_cache is None:
+            log.debug("MockCloudConnector: Fetching plugin list...")
+            # time.sleep(0.5) # Simulate network delay
+            self._plugin_list_cache = tuple(self.plugins_metadata)
+        return self._plugin_list_cache
+
+    def invalidate(self):
+        """使插件列表缓存失效，下次 fetch_plugin_list 会重新获取（安装/更新插件后调用）。"""
+        self._plugin_list_cache = None
+
+    def refresh_sources(self):
+        """重新扫描 sample_plugin_dir，更新已存在源脚本的文件名快照。"""
+        try:
+            with os.scandir(self.sample_plugin_dir) as entries:
+                self._source_files = {entry.name for entry in entries if entry.is_file()}
+        except FileNotFoundError:
+            self._source_files = set()
+
+    def _ensure_dir(self, path):
+        if path not in self._ensured_dirs:
+            os.makedirs(path, exist_ok=True)
+            self._ensured_dirs.add(path)
+
+    def _write_sample_source(self, filename):
+        """把内置的示例脚本 filename 写入 sample_plugin_dir。"""
+        source_path = self._source_paths[filename]
+        self._ensure_dir(self.sample_plugin_dir)
+        with open(source_path, "wb") as f:
+            f.write(self._sample_sources[filename])
+        if filename.endswith(".sh") and _IS_POSIX:
+            os.chmod(source_path, 0o755)
+        self._source_files.add(filename)
+
+    def _ensure_source(self, filename):
+        """
+        确保源脚本 filename 存在；缺失的已知示例脚本只重新写入这一个文件。
+        :return: True如果源脚本可用，False如果不可用
+        """
+        if filename in self._source_files:
+            return True
+        if filename not in self._sample_sources:
+            return False
+        try:
+            self._write_sample_source(filename)
+            return True
+        except OSError as e:
+            log.error("MockCloudConnector: Error creating sample script %s: %s", self._source_paths[filename], e)
+            return False
+
+    def _write_all(self, filenames):
+        """并发写入多个缺失的示例脚本，让各文件的 open/write/close 相互重叠。"""
+        if not filenames:
+            return
+        with ThreadPoolExecutor(max_workers=len(filenames)) as executor:
+            list(executor.map(self._write_sample_source, filenames))
+
+    def download_plugins_batch(self, infos_and_paths, max_workers=4):
+        infos_and_paths = list(infos_and_paths)
+        missing = {info.get("script_filename") for info, _ in infos_and_paths} - self._source_files
+        try:
+            self._write_all([name for name in missing if name in self._sample_sources])
+        except OSError as e:
+            # 逐个下载时会针对具体插件重试并报告错误
+            log.warning("MockCloudConnector: Error creating sample scripts: %s", e)
+        return super().download_plugins_batch(infos_and_paths, max_workers)
 
     def download_plugin_script(self, plugin_info, local_save_path):
-        print(f"MockCloudConnector: 'Downloading' {plugin_info['name']} to {local_save_path}...")
+        cache_key = (plugin_info.get('download_url'), plugin_info.get('version'))
+        cached = self._download_cache.get(cache_key)
+        if cached and cached[0] == local_save_path:
+            try:
+                st = os.stat(local_save_path)
+                if (st.st_size, st.st_mtime_ns) == cached[1:]:
+                    log.debug("MockCloudConnector: %s already at %s, skipping copy.", plugin_info['name'],
+                              local_save_path)
+                    return True
+            except OSError:
+                pass
+            self._download_cache.pop(cache_key, None)
+
+        log.debug("MockCloudConnector: 'Downloading' %s to %s...", plugin_info['name'], local_save_path)
         # time.sleep(1) # Simulate download delay
 
         source_script_name = plugin_info.get("script_filename")
         if not source_script_name:
-            print(f"Error: Plugin info for {plugin_info['name']} missing 'script_filename'.")
+            log.error("Plugin info for %s missing 'script_filename'.", plugin_info['name'])
             return False
 
-        source_path = os.path.join(self.sample_plugin_dir, source_script_name)
+        source_path = self._source_paths.get(source_script_name)
+        if source_path is None:
+            source_path = os.path.join(self.sample_plugin_dir, source_script_name)
 
-        if not os.path.exists(source_path):
-            print(f"Error: Source script {source_path} does not exist for plugin {plugin_info['name']}.")
-            # Attempt to create it if it's one of the known sample scripts
-            if plugin_info['name'] == "Process Data (Python)" and not os.path.exists(
-                    os.path.join(self.sample_plugin_dir, "process_data.py")):
-                self.__init__()  # Re-run init to create files if they were deleted
-                if not os.path.exists(source_path): return False  # Still not there
-            else:
-                return False
+        if not self._ensure_source(source_script_name):
+            log.error("Source script %s does not exist for plugin %s.", source_path, plugin_info['name'])
+            return False
 
         try:
-            os.makedirs(os.path.dirname(local_save_path), exist_ok=True)
-            shutil.copy(source_path, local_save_path)
-            if plugin_info['script_type'] == 'sh' and os.name != 'nt':
+            self._ensure_dir(os.path.dirname(local_save_path))
+            try:
+                _copy_script(source_path, local_save_path)
+            except FileNotFoundError:
+                # 快照已过期（源脚本或目标目录被外部删除）：刷新后在本次调用内重试一次
+                self.refresh_sources()
+                self._ensured_dirs.clear()
+                if not self._ensure_source(source_script_name):
+                    log.error("Source script %s does not exist for plugin %s.", source_path, plugin_info['name'])
+                    return False
+                self._ensure_dir(os.path.dirname(local_save_path))
+                _copy_script(source_path, local_save_path)
+            st = os.stat(local_save_path)
+            # 只复制了内容；覆盖已有的 0o755 文件时权限不变，只有不是 0o755 时才需要 chmod
+            if plugin_info.get('script_type') == SCRIPT_TYPE_SH and _IS_POSIX and (st.st_mode & 0o777) != 0o755:
                 try:
                     os.chmod(local_save_path, 0o755)
-                except Exception as e_chmod:
-                    print(
-                        f"MockCloudConnector: Warning - could not set execute permission for {local_save_path}: {e_chmod}")
-            print(f"MockCloudConnector: Successfully 'downloaded' {plugin_info['name']}.")
+                except OSError as e_chmod:
+                    log.warning("MockCloudConnector: could not set execute permission for %s: %s",
+                                local_save_path, e_chmod)
+            self._download_cache[cache_key] = (local_save_path, st.st_size, st.st_mtime_ns)
+            log.info("MockCloudConnector: Successfully 'downloaded' %s.", plugin_info['name'])
             return True
-        except Exception as e:
-            print(f"MockCloudConnector: Error 'downloading' {plugin_info['name']}: {e}")
+        except OSError as e:  # 包括 shutil.SameFileError
+            log.error("MockCloudConnector: Error 'downloading' %s: %s", plugin_info['name'], e)
+            self.refresh_sources()  # 快照可能已过期（例如源文件被外部删除）
+            self._ensured_dirs.clear()
             return False
\ No newline at end of file
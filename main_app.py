@@ -1,44 +1,50 @@
 # main_app.py
 import sys
 import os
+import logging
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QListWidget, QListWidgetItem, QLabel, QTextEdit,
     QSplitter, QGroupBox, QFormLayout, QMessageBox, QDialog,
     QLineEdit, QDialogButtonBox, QSpinBox, QFileDialog
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QObject
-from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt, QThreadPool, QRunnable, QTimer, QSignalBlocker, pyqtSignal, pyqtSlot, QObject
+from PyQt5.QtGui import QFont, QTextCursor
 
 from cloud_interface import MockCloudConnector  # 使用模拟接口
 from plugin_manager import PluginManager, Plugin  # Plugin class is used for type hinting
 
 
-# --- Worker Thread for long tasks (Download/Run) ---
-class Worker(QObject):
+# --- Worker tasks for long operations (Download/Run), executed on a shared QThreadPool ---
+class WorkerSignals(QObject):
     finished = pyqtSignal()
     progress = pyqtSignal(str)  # For text updates from plugin execution
     result = pyqtSignal(bool, str, object)  # success, message, plugin_object (optional)
 
+
+class WorkerTask(QRunnable):
     def __init__(self, task_callable, *args, **kwargs):
         super().__init__()
+        self.setAutoDelete(False)  # Lifetime is managed by PluginMarketWindow._active_tasks
         self.task_callable = task_callable
         self.args = args
         self.kwargs = kwargs
+        self.signals = WorkerSignals()
 
     def run(self):
         try:
-            success, message, plugin_obj = self.task_callable(*self.args, **self.kwargs)
-            self.result.emit(success, message, plugin_obj)
+            success, message, plugin_obj = self.task_callable(
+                *self.args, progress_callback=self.signals.progress.emit, **self.kwargs)
+            self.signals.result.emit(success, message, plugin_obj)
         except Exception as e:
-            self.result.emit(False, f"Worker error: {e}", None)
+            self.signals.result.emit(False, f"Worker error: {e}", None)
         finally:
-            self.finished.emit()
+            self.signals.finished.emit()
 
 
 # --- Parameter Dialog ---
 class ParameterDialog(QDialog):
-    def __init__(self, plugin_name, expected_args, parent=None):
+    def __init__(self, plugin_name, expected_args, parent=None, arg_template=None):
         super().__init__(parent)
         self.setWindowTitle(f"Parameters for {plugin_name}")
         self.setMinimumWidth(400)
@@ -74,12 +80,12 @@ class ParameterDialog(QDialog):
                 line_edit = QLineEdit(self)
                 if default_value is not None: line_edit.setText(str(default_value))
                 browse_button = QPushButton("Browse...", self)
-                # Use a lambda to pass the line_edit to the browse function
-                browse_button.clicked.connect(lambda _, le=line_edit: self.browse_file(le))
+                # The button remembers which arg it belongs to; one bound slot serves all Browse buttons
+                browse_button.setProperty('line_edit_name', arg_name)
+                browse_button.clicked.connect(self._on_browse_clicked)
                 widget_layout.addWidget(line_edit)
                 widget_layout.addWidget(browse_button)
-                widget = QWidget()  # Use a container widget for the QHBoxLayout
-                widget.setLayout(widget_layout)
+                widget = widget_layout  # QFormLayout.addRow accepts a layout directly, no container widget needed
                 self.inputs_widgets[arg_name] = line_edit  # Store the line_edit for value retrieval
             else:  # Default to string
                 widget = QLineEdit(self)
@@ -91,12 +97,27 @@ class ParameterDialog(QDialog):
             self.form_layout.addRow(label, widget)
 
         self.layout.addLayout(self.form_layout)
+
+        # Per-arg (name, option_token, is_bool_flag, required); callers pass the plugin's cached template
+        if arg_template is None:
+            arg_template = Plugin.build_arg_template(expected_args)
+        self._arg_plan = arg_template
+
         self.button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.button_box.accepted.connect(self.accept)
         self.button_box.rejected.connect(self.reject)
         self.layout.addWidget(self.button_box)
 
+    @pyqtSlot()
+    def _on_browse_clicked(self):
+        self.browse_file(self.inputs_widgets[self.sender().property('line_edit_name')])
+
     def browse_file(self, line_edit_widget):
+        # Reuse the main window's file dialog if available (much faster after the first open)
+        parent = self.parent()
+        if hasattr(parent, 'browse_file_shared'):
+            parent.browse_file_shared(line_edit_widget)
+            return
         # For 'save' type args, use QFileDialog.getSaveFileName
         # For 'open' type args, use QFileDialog.getOpenFileName
         # Assuming 'open' for now
@@ -108,83 +129,31 @@ class ParameterDialog(QDialog):
 
     def get_parameters_as_list(self):
         params_list = []
-        # Iterate based on the original order of expected_args to maintain positional correspondence if needed
-        for arg_def in self.arg_definitions:
-            arg_name = arg_def.get('name')
-            widget = self.inputs_widgets.get(arg_name)  # This gets QLineEdit, QSpinBox, etc.
-            value_str = None  # We'll store the string representation of the value here
-            is_boolean_flag = arg_def.get('type',
-                                          'str').lower() == 'bool_flag'  # A new type for checkbox-like flags
-            required = arg_def.get('required', False)
-
+        # Iterate in the original order of expected_args to maintain positional correspondence if needed
+        for arg_name, option_token, is_boolean_flag, required in self._arg_plan:
             if is_boolean_flag:
-                # Assuming widget here would be a QCheckBox if fully implemented
-                # For now, let's simulate. If ParameterDialog had a QCheckBox for this arg_name:
-                # if widget.isChecked():
-                #    params_list.append(f"--{arg_name.lstrip('-')}")
-                # For this example, we'll assume bool_flag args are not 'required' in the sense of needing a value.
-                # They are either present (flag passed) or absent.
-                # The ParameterDialog would need a QCheckBox for this.
-                # Since we don't have a QCheckBox yet in ParameterDialog for a 'bool_flag' type,
-                # this path won't be fully active unless you add one.
-                # Let's assume for now that if a bool_flag is defined but not 'required' to be true,
-                # we don't add it unless the (future) checkbox is checked.
-                # If you want to pass it if a default is true, that's another logic layer.
-                # For now, we'll just skip adding it if it's a bool_flag and we don't have a UI element.
-                pass  # Placeholder: Add logic if QCheckBox is implemented for 'bool_flag'
-
-            elif isinstance(widget, QLineEdit):
+                # 'bool_flag' has no checkbox in this dialog yet, so there is no value to read.
+                # An explicit option name (e.g. "--verbose") is always passed; other flags are skipped.
+                if arg_name.startswith('-'):
+                    params_list.append(option_token)
+                continue
+
+            widget = self.inputs_widgets.get(arg_name)  # This gets QLineEdit, QSpinBox, etc.
+            value_str = None
+            if isinstance(widget, QLineEdit):
                 value_str = widget.text()
             elif isinstance(widget, QSpinBox):
                 value_str = str(widget.value())
 
-            # Check required for non-boolean flags (boolean flags are either present or not)
-            if not is_boolean_flag and required and (value_str is None or value_str.strip() == ""):
-                QMessageBox.warning(self, "Missing Parameter", f"Required parameter '{arg_name}' is not provided.")
-                return None  # Indicate error
-
-            # Construct the argument list
-            # Ensure arg_name is valid before proceeding
-            if not arg_name:
-                print(f"Warning: Argument definition found without a name: {arg_def}")
-                continue
+            if value_str is None or value_str.strip() == "":
+                if required:
+                    QMessageBox.warning(self, "Missing Parameter", f"Required parameter '{arg_name}' is not provided.")
+                    return None  # Indicate error
+                continue  # Optional field left blank: let argparse use its default
 
-            # For plugins that use argparse, it's better to pass as ['--arg-name', 'value']
-            # If an arg name starts with '--' or '-', assume it's an option.
-            if arg_name.startswith('-'):  # Explicitly an option like --my-option
-                params_list.append(arg_name)
-                if not is_boolean_flag:  # Boolean flags (like --verbose) don't take a value after them
-                    params_list.append(value_str if value_str is not None else "")
-            else:  # Positional, or needs to be converted to an option like --name value
-                # Let's always convert to an option for argparse friendliness unless it's a bool_flag
-                if is_boolean_flag:
-                    # This would be where a QCheckBox's state determines if the flag is added
-                    # Example: if self.inputs_widgets[arg_name].isChecked(): # Assuming inputs_widgets stores QCheckBox
-                    # params_list.append(f"--{arg_name.lstrip('-')}")
-                    # For now, we are not adding QCheckBox, so this part is illustrative.
-                    # If you add a 'bool_flag' type to `expected_args` and a QCheckBox in the dialog,
-                    # you'd check its state here.
-                    # Let's say if `value_str` (from a hypothetical checkbox that sets 'true'/'false') is 'true':
-                    if str(arg_def.get('default_bool_state',
-                                       False)).lower() == 'true':  # Example: if default is true
-                        pass  # This logic needs a UI element for bool_flag
-                        # params_list.append(f"--{arg_name.lstrip('-')}")
-
-
-                elif value_str is not None:  # Only add if there's a value (or it's required then checked above)
-                    # Ensure it's an option like --input-file, even if arg_name was "input-file"
-                    option_name = arg_name.lstrip('-')  # Remove leading dashes if any
-                    if not option_name.startswith('-') and len(
-                            option_name) > 1:  # for single letter options like -v, don't add --
-                        params_list.append(f"--{option_name}")
-                    elif not option_name.startswith('-') and len(option_name) == 1:
-                        params_list.append(f"-{option_name}")
-                    else:  # It already was --option or -o
-                        params_list.append(arg_name)
-
-                    params_list.append(value_str)
-                # If value_str is None (e.g. optional field left blank) and not a bool_flag, we don't append anything for it.
-                # Argparse handles optional arguments not being present.
+            # Pass as ['--arg-name', 'value'] for argparse friendliness
+            params_list.append(option_token)
+            params_list.append(value_str)
 
         return params_list
 
@@ -196,11 +165,29 @@ class PluginMarketWindow(QMainWindow):
         self.setGeometry(100, 100, 900, 700)
 
         self.cloud_connector = MockCloudConnector()
-        self.plugin_manager = PluginManager(self.cloud_connector, local_plugins_dir="plugins")
+        # auto_save=False: state changes (including discovery on the GUI thread) only mark the DB dirty;
+        # _maybe_save_db writes it off the GUI thread and closeEvent flushes the rest
+        self.plugin_manager = PluginManager(self.cloud_connector, local_plugins_dir="plugins", auto_save=False)
 
         self.current_selected_plugin_id = None
-        self.active_worker_thread = None
-        self.active_worker_object = None
+        # Reuse pooled threads instead of creating/destroying a QThread per task
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(2)  # e.g. a download and a run can overlap
+        self._active_tasks = set()  # WorkerTask objects that have not finished yet
+        self._busy_plugin_ids = set()  # Plugins with a download/run in progress
+        self._run_in_progress = False  # At most one run at a time: runs share output_console
+        self._item_by_id = {}  # plugin_id -> QListWidgetItem currently shown in plugin_list_widget
+        self._file_dialog = None  # Shared by all ParameterDialogs, created on first use (see browse_file_shared)
+
+        # Write-behind persistence of the local plugin DB: flush pending changes every 5 s off the GUI thread
+        # Saves get their own pool so they never count as a busy Download/Run slot in thread_pool
+        self._save_pool = QThreadPool(self)
+        self._save_pool.setMaxThreadCount(1)
+        self._db_save_in_flight = False
+        self._save_timer = QTimer(self)
+        self._save_timer.setInterval(5000)
+        self._save_timer.timeout.connect(self._maybe_save_db)
+        self._save_timer.start()
 
         self.init_ui()
         self.refresh_plugin_list()
@@ -266,36 +253,92 @@ class PluginMarketWindow(QMainWindow):
         self.output_console = QTextEdit()
         self.output_console.setReadOnly(True)
         self.output_console.setFont(QFont("Courier New", 9))
+        self.output_console.document().setMaximumBlockCount(5000)  # Keep long-running output bounded
         right_layout.addWidget(self.output_console)
 
+        # Plugin output arrives line by line; buffer it and flush in one insert per timer tick
+        self._out_buf = []
+        self._out_timer = QTimer(self)
+        self._out_timer.setInterval(40)
+        self._out_timer.setSingleShot(True)
+        self._out_timer.timeout.connect(self._flush_output)
+
         splitter.addWidget(right_widget)
         splitter.setSizes([300, 600])
 
         main_layout.addWidget(splitter)
         self.statusBar().showMessage("Ready.")
 
+    @staticmethod
+    def _plugin_item_text(plugin):
+        item_text = f"{plugin.name} (v{plugin.version})"
+        if plugin.is_downloaded:
+            item_text += " [Downloaded]"
+        return item_text
+
     def update_plugin_display_list(self):
-        self.plugin_list_widget.clear()
-        plugins = sorted(self.plugin_manager.available_plugins.values(), key=lambda p: p.name)
-        for plugin in plugins:
-            item_text = f"{plugin.name} (v{plugin.version})"
-            if plugin.is_downloaded:
-                item_text += " [Downloaded]"
-
-            list_item = QListWidgetItem(item_text)
-            list_item.setData(Qt.UserRole, plugin.id)
-            self.plugin_list_widget.addItem(list_item)
-
-        if self.current_selected_plugin_id:
-            for i in range(self.plugin_list_widget.count()):
-                item = self.plugin_list_widget.item(i)
-                if item.data(Qt.UserRole) == self.current_selected_plugin_id:
-                    self.plugin_list_widget.setCurrentItem(item)
-                    break
-        elif self.plugin_list_widget.count() > 0:
-            self.plugin_list_widget.setCurrentRow(0)
-
-        self.on_plugin_selected(self.plugin_list_widget.currentItem(), None)
+        # Diff against the items already in the list instead of clear() + re-adding everything,
+        # so unchanged rows keep their widgets and the scroll position is preserved.
+        plugins = list(self.plugin_manager.iter_sorted())
+        list_widget = self.plugin_list_widget
+        # currentItemChanged would fire on every take/insert/select; block it and update the details pane once below
+        with QSignalBlocker(list_widget):
+            list_widget.setUpdatesEnabled(False)
+            try:
+                desired_ids = {plugin.id for plugin in plugins}
+                for plugin_id in [pid for pid in self._item_by_id if pid not in desired_ids]:
+                    list_widget.takeItem(list_widget.row(self._item_by_id.pop(plugin_id)))
+
+                for row, plugin in enumerate(plugins):
+                    item_text = self._plugin_item_text(plugin)
+                    list_item = self._item_by_id.get(plugin.id)
+                    if list_item is None:
+                        list_item = QListWidgetItem(item_text)
+                        list_item.setData(Qt.UserRole, plugin.id)
+                        list_widget.insertItem(row, list_item)
+                        self._item_by_id[plugin.id] = list_item
+                        continue
+                    if list_item.text() != item_text:
+                        list_item.setText(item_text)
+                    if list_widget.item(row) is not list_item:  # Sort position changed (e.g. renamed)
+                        list_widget.insertItem(row, list_widget.takeItem(list_widget.row(list_item)))
+            finally:
+                list_widget.setUpdatesEnabled(True)
+
+            selected_item = self._item_by_id.get(self.current_selected_plugin_id)
+            if selected_item is not None:
+                if list_widget.currentItem() is not selected_item:
+                    list_widget.setCurrentItem(selected_item)
+            elif list_widget.count() > 0:
+                list_widget.setCurrentRow(0)
+
+        self.on_plugin_selected(list_widget.currentItem(), None)
+
+    def browse_file_shared(self, line_edit):
+        # Constructing a QFileDialog and enumerating its start directory is the slow part,
+        # so keep one instance alive; it also remembers the last-used directory between opens.
+        if self._file_dialog is None:
+            self._file_dialog = QFileDialog(self, "Select File")
+            self._file_dialog.setFileMode(QFileDialog.ExistingFile)
+            self._file_dialog.setNameFilter("All Files (*)")
+        current_dir = os.path.dirname(line_edit.text())
+        if current_dir and os.path.isdir(current_dir):
+            self._file_dialog.setDirectory(current_dir)
+        if self._file_dialog.exec_() == QDialog.Accepted:
+            selected_files = self._file_dialog.selectedFiles()
+            if selected_files:
+                line_edit.setText(selected_files[0])
+
+    def _update_plugin_row(self, plugin):
+        # A finished download/run only changes one plugin, so just relabel its row;
+        # fall back to the full diff update if the row is unknown.
+        list_item = self._item_by_id.get(plugin.id) if plugin else None
+        if list_item is None:
+            self.update_plugin_display_list()
+            return
+        item_text = self._plugin_item_text(plugin)
+        if list_item.text() != item_text:
+            list_item.setText(item_text)
 
     def refresh_plugin_list(self):
         self.statusBar().showMessage("Refreshing plugin list from cloud...")
@@ -329,51 +372,67 @@ class PluginMarketWindow(QMainWindow):
             self.author_label.setText(plugin.author)
             self.status_label.setText(plugin.status_message)
 
-            args_text = "None"
-            if plugin.expected_args:
-                args_text = "\n".join([
-                    f"- {arg.get('name')}{'*' if arg.get('required') else ''} ({arg.get('type', 'str')}): {arg.get('description', 'N/A')}"
-                    for arg in plugin.expected_args
-                ])
-            self.args_def_label.setText(args_text)
+            self.args_def_label.setText(plugin.args_text())
 
-            task_is_active = self.active_worker_thread is not None and self.active_worker_thread.isRunning()
+            task_is_active = plugin.id in self._busy_plugin_ids
 
             self.download_button.setEnabled(not plugin.is_downloaded and not task_is_active)
             self.run_button.setEnabled(
                 plugin.is_downloaded and \
-                (plugin.local_path and os.path.exists(plugin.local_path)) and \
-                not task_is_active
+                plugin.local_file_present() and \
+                not task_is_active and \
+                not self._run_in_progress
             )
         else:
             self.current_selected_plugin_id = None
             QMessageBox.warning(self, "Error", f"Could not find details for plugin ID: {plugin_id}")
 
-    def _start_worker_task(self, task_callable, *args, **kwargs):
-        if self.active_worker_thread and self.active_worker_thread.isRunning():
+    def _start_worker_task(self, task_callable, plugin_id, *args, on_result=None, on_progress=None, is_run=False):
+        if plugin_id in self._busy_plugin_ids or (is_run and self._run_in_progress) or \
+                self.thread_pool.activeThreadCount() >= self.thread_pool.maxThreadCount():
             QMessageBox.information(self, "Busy", "Another operation is already in progress.")
             return None
 
-        worker = Worker(task_callable, *args, **kwargs)
-        thread = QThread()
-        self.active_worker_object = worker
-        self.active_worker_thread = thread
-        worker.moveToThread(thread)
-        worker.finished.connect(thread.quit)
-        worker.finished.connect(worker.deleteLater)
-        thread.finished.connect(thread.deleteLater)
-        thread.finished.connect(self._clear_active_worker_references)
-        thread.started.connect(worker.run)
-        thread.start()
-        return worker
-
-    def _clear_active_worker_references(self):
-        self.active_worker_object = None
-        self.active_worker_thread = None
+        task = WorkerTask(task_callable, plugin_id, *args)
+        # Connect before starting so no early signal is missed
+        if on_progress:
+            task.signals.progress.connect(on_progress)
+        if on_result:
+            task.signals.result.connect(on_result)
+        task.signals.finished.connect(lambda: self._on_worker_task_finished(task, plugin_id, is_run))
+        self._active_tasks.add(task)
+        self._busy_plugin_ids.add(plugin_id)
+        if is_run:
+            self._run_in_progress = True
+        self.thread_pool.start(task)
+        return task
+
+    def _on_worker_task_finished(self, task, plugin_id, is_run=False):
+        self._active_tasks.discard(task)
+        self._busy_plugin_ids.discard(plugin_id)
+        if is_run:
+            self._run_in_progress = False
         current_list_item = self.plugin_list_widget.currentItem()
         self.on_plugin_selected(current_list_item, None)
 
-    def _task_wrapper_for_download(self, plugin_id):
+    def _maybe_save_db(self):
+        if not self.plugin_manager._dirty or self._db_save_in_flight:
+            return
+        task = WorkerTask(self._task_save_db)
+        self._db_save_in_flight = True
+        task.signals.finished.connect(lambda: self._on_db_save_finished(task))
+        self._active_tasks.add(task)
+        self._save_pool.start(task)
+
+    def _on_db_save_finished(self, task):
+        self._active_tasks.discard(task)
+        self._db_save_in_flight = False
+
+    def _task_save_db(self, progress_callback=None):
+        self.plugin_manager.flush()
+        return True, "Saved local plugin DB.", None
+
+    def _task_wrapper_for_download(self, plugin_id, progress_callback=None):
         plugin = self.plugin_manager.get_plugin_by_id(plugin_id)
         if not plugin: return False, "Plugin not found", None
         success, msg = self.plugin_manager.download_plugin(plugin_id)
@@ -388,10 +447,9 @@ class PluginMarketWindow(QMainWindow):
         self.download_button.setEnabled(False)
         self.run_button.setEnabled(False)
 
-        worker_obj = self._start_worker_task(self._task_wrapper_for_download, self.current_selected_plugin_id)
-        if worker_obj:
-            worker_obj.result.connect(self.handle_download_result)
-        else:
+        worker_task = self._start_worker_task(self._task_wrapper_for_download, self.current_selected_plugin_id,
+                                              on_result=self.handle_download_result)
+        if not worker_task:
             self.statusBar().showMessage(f"Could not start download for {plugin.name}. Another task might be active.",
                                          3000)
             self.on_plugin_selected(self.plugin_list_widget.currentItem(), None)
@@ -402,21 +460,17 @@ class PluginMarketWindow(QMainWindow):
         else:
             self.statusBar().showMessage(f"Download operation: {message}", 5000)
 
-        self.update_plugin_display_list()
+        self._update_plugin_row(plugin_obj)
         current_list_item = self.plugin_list_widget.currentItem()
         if current_list_item and plugin_obj and current_list_item.data(Qt.UserRole) == plugin_obj.id:
             self.on_plugin_selected(current_list_item, None)  # Re-select to update details pane if needed
 
-    def _task_wrapper_for_run(self, plugin_id, plugin_args_list=None):  # Added plugin_args_list
+    def _task_wrapper_for_run(self, plugin_id, plugin_args_list=None, progress_callback=None):
         plugin = self.plugin_manager.get_plugin_by_id(plugin_id)
         if not plugin: return False, "Plugin not found", None
 
-        def emit_output_from_worker_context(text):
-            if self.active_worker_object:
-                self.active_worker_object.progress.emit(text)
-
         success, msg = self.plugin_manager.run_plugin(plugin_id,
-                                                      output_callback=emit_output_from_worker_context,
+                                                      output_callback=progress_callback,
                                                       args_for_plugin=plugin_args_list if plugin_args_list else [])  # Pass args
         return success, msg, plugin
 
@@ -427,9 +481,14 @@ class PluginMarketWindow(QMainWindow):
         plugin = self.plugin_manager.get_plugin_by_id(self.current_selected_plugin_id)
         if not plugin: return
 
+        # Check before touching output_console: clearing it would wipe the running plugin's output
+        if self._run_in_progress:
+            QMessageBox.information(self, "Busy", "Another plugin is already running.")
+            return
+
         plugin_args_to_pass = []  # This will hold the ['--arg', 'value', '--another', 'val'] list
         if plugin.expected_args:
-            dialog = ParameterDialog(plugin.name, plugin.expected_args, self)
+            dialog = ParameterDialog(plugin.name, plugin.expected_args, self, plugin.arg_template())
             if dialog.exec_() == QDialog.Accepted:
                 plugin_args_to_pass = dialog.get_parameters_as_list()
                 if plugin_args_to_pass is None:  # An error occurred (e.g. missing required param)
@@ -439,6 +498,7 @@ class PluginMarketWindow(QMainWindow):
                 self.statusBar().showMessage(f"Run cancelled for {plugin.name}.", 3000)
                 return  # User cancelled
 
+        self._out_buf.clear()
         self.output_console.clear()
         self.append_to_output_console(f"Attempting to run '{plugin.name}' with args: {plugin_args_to_pass}...")
         self.statusBar().showMessage(f"Running {plugin.name}...")
@@ -446,12 +506,12 @@ class PluginMarketWindow(QMainWindow):
         self.download_button.setEnabled(False)
 
         # Pass plugin_args_to_pass to the worker task
-        worker_obj = self._start_worker_task(self._task_wrapper_for_run, self.current_selected_plugin_id,
-                                             plugin_args_to_pass)
-        if worker_obj:
-            worker_obj.progress.connect(self.append_to_output_console)
-            worker_obj.result.connect(self.handle_run_result)
-        else:
+        worker_task = self._start_worker_task(self._task_wrapper_for_run, self.current_selected_plugin_id,
+                                              plugin_args_to_pass,
+                                              on_result=self.handle_run_result,
+                                              on_progress=self.append_to_output_console,
+                                              is_run=True)
+        if not worker_task:
             self.statusBar().showMessage(f"Could not start run for {plugin.name}. Another task might be active.", 3000)
             self.append_to_output_console("Failed to start run task.")
             self.on_plugin_selected(self.plugin_list_widget.currentItem(), None)
@@ -463,6 +523,7 @@ class PluginMarketWindow(QMainWindow):
             self.append_to_output_console(f"--- {plugin_obj.name} execution finished ---")
             self.append_to_output_console(f"Result: {plugin_obj.status_message}")  # Use status from plugin manager
             if "failed with code" in final_message.lower() or "error output" in final_message.lower():
+                self._flush_output()  # Make sure buffered output is in the document before searching it
                 if not any(line.strip().endswith(final_message.strip()) for line in
                            self.output_console.toPlainText().splitlines()):
                     self.append_to_output_console(f"Details: {final_message}")
@@ -470,23 +531,36 @@ class PluginMarketWindow(QMainWindow):
             self.statusBar().showMessage(f"Run operation: {final_message}", 5000)
             self.append_to_output_console(f"Run operation: {final_message}")
 
-        self.update_plugin_display_list()
+        self._update_plugin_row(plugin_obj)
         current_list_item = self.plugin_list_widget.currentItem()
         if current_list_item and plugin_obj and current_list_item.data(Qt.UserRole) == plugin_obj.id:
             self.on_plugin_selected(current_list_item, None)  # Re-select to update details and button states
 
     def append_to_output_console(self, text):
-        self.output_console.append(text.rstrip('\n'))
+        self._out_buf.append(text.rstrip('\n'))
+        if not self._out_timer.isActive():
+            self._out_timer.start()
+
+    def _flush_output(self):
+        if not self._out_buf:
+            return
+        text = '\n'.join(self._out_buf)
+        self._out_buf.clear()
+        cursor = self.output_console.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        if not self.output_console.document().isEmpty():
+            text = '\n' + text  # Same as append(): each entry starts a new line
+        cursor.insertText(text)
+        self.output_console.setTextCursor(cursor)
         self.output_console.ensureCursorVisible()
 
     def closeEvent(self, event):
-        if self.active_worker_thread and self.active_worker_thread.isRunning():
+        if self.thread_pool.activeThreadCount() > 0:
             reply = QMessageBox.question(self, 'Confirm Exit',
                                          "A task is currently running. Are you sure you want to exit?",
                                          QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             if reply == QMessageBox.Yes:
-                self.active_worker_thread.quit()
-                if not self.active_worker_thread.wait(1000):  # Shorter wait
+                if not self.thread_pool.waitForDone(1000):  # Shorter wait
                     print("Worker thread did not finish gracefully on close.")
                 event.accept()
             else:
@@ -496,10 +570,14 @@ class PluginMarketWindow(QMainWindow):
             event.accept()
 
         if event.isAccepted():
-            self.plugin_manager._save_local_plugin_db()
+            self._save_timer.stop()
+            self._save_pool.waitForDone()  # Let an in-flight background save finish (it is short)
+            self.plugin_manager.flush()  # Final synchronous save, only if something is still pending
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     # Create directories if they don't exist
     for dir_path in ["plugins", "sample_plugins_for_cloud"]:
         if not os.path.exists(dir_path):
@@ -1,17 +1,138 @@
 # plugin_manager.py
 import os
+import hashlib
 import subprocess
 import sys
 import json
+import selectors
+import threading
 import traceback  # For detailed exception logging
+from contextlib import contextmanager
+
+try:
+    import orjson  # 可选依赖：安装后本地DB的读写快很多
+except ImportError:
+    orjson = None
 
 # 本地插件状态存储文件名
 LOCAL_PLUGIN_DB_FILE = "local_plugins.json"
 
+# 已解析的本地DB：路径 -> ((st_mtime_ns, st_size), 解析结果, 文件内容哈希)。
+# 同一进程内再次创建 PluginManager 时，文件未变化就不必重新解析；解析结果只读，不要修改。
+_DB_CACHE = {}
+
+# 读取子进程输出时每次 os.read 的最大字节数
+_READ_CHUNK_SIZE = 1 << 16
+
+if orjson is not None:
+    _json_loads = orjson.loads
+
+    def _json_dumps_bytes(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    def _metadata_hash(plugin_data):
+        """云端元数据的哈希（键排序后序列化），仅用于同一进程内比较，不写入DB。"""
+        return hash(orjson.dumps(dict(plugin_data), default=dict, option=orjson.OPT_SORT_KEYS))
+else:
+    _json_loads = json.loads
+
+    def _json_dumps_bytes(obj):
+        return json.dumps(obj, indent=4).encode('utf-8')
+
+    def _metadata_hash(plugin_data):
+        """云端元数据的哈希（键排序后序列化），仅用于同一进程内比较，不写入DB。"""
+        return hash(json.dumps(dict(plugin_data), default=dict, sort_keys=True))
+
+
+def _payload_hash(payload):
+    """本地DB文件内容的摘要，用于判断是否需要重新写盘。"""
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def _read_process_output(process, handle_stdout=None, handle_stderr=None):
+    """
+    同时读取子进程的 stdout 和 stderr 直到两者都关闭。
+
+    两个管道一起读，任何一个写满管道缓冲区都不会让子进程卡住。
+    给出回调时按行（已解码）交给对应的回调。
+    :return: (stdout 字节, stderr 字节)，由调用方一次性解码
+    """
+    if os.name == 'nt':  # Windows 上 select 不支持管道，改为每个管道一个读取线程
+        return _read_process_output_threaded(process, handle_stdout, handle_stderr)
+
+    stdout_fd, stderr_fd = process.stdout.fileno(), process.stderr.fileno()
+    handlers = {stdout_fd: handle_stdout, stderr_fd: handle_stderr}
+    buffers = {stdout_fd: bytearray(), stderr_fd: bytearray()}
+    line_starts = {stdout_fd: 0, stderr_fd: 0}  # 每个缓冲区中尚未交给回调的位置
+    with selectors.DefaultSelector() as sel:
+        for fd in handlers:
+            os.set_blocking(fd, False)
+            sel.register(fd, selectors.EVENT_READ)
+        while sel.get_map():
+            for key, _ in sel.select():
+                fd = key.fd
+                try:
+                    chunk = os.read(fd, _READ_CHUNK_SIZE)
+                except BlockingIOError:
+                    continue
+                buf, handler, start = buffers[fd], handlers[fd], line_starts[fd]
+                if not chunk:  # EOF
+                    sel.unregister(fd)
+                    if handler and start < len(buf):
+                        handler(buf[start:].decode('utf-8', 'replace'))
+                    continue
+                buf += chunk
+                if handler:
+                    end = buf.rfind(b'\n', start)
+                    if end >= 0:
+                        for line in buf[start:end].split(b'\n'):
+                            if line.endswith(b'\r'):  # 与文本模式一致，把 \r\n 当作 \n
+                                line = line[:-1]
+                            handler(line.decode('utf-8', 'replace') + '\n')
+                        line_starts[fd] = end + 1
+    return buffers[stdout_fd].replace(b'\r\n', b'\n'), buffers[stderr_fd].replace(b'\r\n', b'\n')
+
+
+def _read_pipe_lines(pipe, handler, buf):
+    """逐行读取一个管道直到 EOF，原始字节追加到 buf，每行（已解码）交给 handler。"""
+    for line in iter(pipe.readline, b''):
+        buf += line
+        if handler:
+            handler(line.decode('utf-8', 'replace').replace('\r\n', '\n'))
+
+
+def _read_process_output_threaded(process, handle_stdout=None, handle_stderr=None):
+    """_read_process_output 的线程版本：用于不能 select 管道的平台，输出同样实时回调。"""
+    stdout_buf, stderr_buf = bytearray(), bytearray()
+    readers = [threading.Thread(target=_read_pipe_lines, args=args, daemon=True)
+               for args in ((process.stdout, handle_stdout, stdout_buf),
+                            (process.stderr, handle_stderr, stderr_buf))]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    return stdout_buf.replace(b'\r\n', b'\n'), stderr_buf.replace(b'\r\n', b'\n')
+
+
+def _option_token(arg_name):
+    """参数名对应的命令行选项：'-x'/'--x' 保持不变，'v' -> '-v'，'input-file' -> '--input-file'。"""
+    if arg_name.startswith('-'):
+        return arg_name
+    return f"--{arg_name}" if len(arg_name) > 1 else f"-{arg_name}"
+
 
 class Plugin:
     """封装插件信息的类"""
 
+    # 插件对象在程序运行期间常驻内存，用 __slots__ 省掉每个实例的 __dict__；新增属性时需要同步添加
+    __slots__ = ('id', 'name', 'description', 'version', 'author', 'script_type', 'download_url',
+                 'script_filename', '_expected_args', '_args_text', '_local_path', '_local_file_present',
+                 '_dirname', '_basename', 'is_downloaded', 'status_message', '_meta_hash', '_executable_set',
+                 '_arg_template')
+
+    # 从云端元数据直接覆盖的字段；script_filename 和 expected_args 需要额外处理，不在其中
+    _UPDATABLE = ('name', 'description', 'version', 'author', 'script_type', 'download_url')
+
     def __init__(self, id, name, description, version, author, script_type, download_url, script_filename,
                  expected_args=None):
         self.id = id
@@ -22,25 +143,110 @@ class Plugin:
         self.script_type = script_type  # 'py' or 'sh'
         self.download_url = download_url
         self.script_filename = script_filename
-        self.expected_args = expected_args if expected_args else []  # 例如: [{"name": "input_file", "type": "str", "description": "输入文件路径", "required": True, "default": "default.txt"}]
+        self._args_text = None  # args_text() 的缓存
+        self._arg_template = None  # arg_template() 的缓存
+        self.expected_args = expected_args  # 例如: [{"name": "input_file", "type": "str", "description": "输入文件路径", "required": True, "default": "default.txt"}]
 
+        self._local_file_present = None  # local_file_present() 的缓存
         self.local_path = None
         self.is_downloaded = False
         self.status_message = "Available"
+        self._meta_hash = None  # 上次应用的云端元数据哈希，相同则 discover_plugins 跳过更新
+        self._executable_set = False  # shell 脚本已确认可执行；重新下载后需要再次检查
+
+    @property
+    def expected_args(self):
+        return self._expected_args
+
+    @expected_args.setter
+    def expected_args(self, value):
+        # 复制为插件自己的普通 list/dict：云端元数据可能是共享的只读视图，而DB序列化需要普通 dict
+        self._expected_args = [dict(arg_def) for arg_def in value] if value else []
+        self._args_text = None  # 参数定义变化后需要重新生成描述
+        self._arg_template = None
+
+    def args_text(self):
+        """参数定义的显示文本（每行一个参数）；结果会缓存，直到 expected_args 被重新赋值。"""
+        if self._args_text is None:
+            if not self._expected_args:
+                self._args_text = "None"
+            else:
+                self._args_text = "\n".join(
+                    f"- {arg.get('name')}{'*' if arg.get('required') else ''} ({arg.get('type', 'str')}): {arg.get('description', 'N/A')}"
+                    for arg in self._expected_args
+                )
+        return self._args_text
+
+    def arg_template(self):
+        """命令行参数模板（见 build_arg_template）；结果会缓存，直到 expected_args 被重新赋值。"""
+        if self._arg_template is None:
+            self._arg_template = self.build_arg_template(self._expected_args)
+        return self._arg_template
+
+    @staticmethod
+    def build_arg_template(expected_args):
+        """
+        把参数定义转换为 (name, option_token, is_bool_flag, required) 元组组成的元组，
+        调用方只需按顺序填入参数值。没有名字的参数定义会被跳过。
+        """
+        template = []
+        for arg_def in expected_args:
+            arg_name = arg_def.get('name')
+            if not arg_name:
+                print(f"Warning: Argument definition found without a name: {arg_def}")
+                continue
+            template.append((arg_name, _option_token(arg_name),
+                             arg_def.get('type', 'str').lower() == 'bool_flag',
+                             arg_def.get('required', False)))
+        return tuple(template)
+
+    @property
+    def local_path(self):
+        return self._local_path
+
+    @local_path.setter
+    def local_path(self, value):
+        self._local_path = value
+        self._local_file_present = None  # 路径变化后需要重新检查文件是否存在
+        self._update_path_cache()
+
+    def _update_path_cache(self):
+        """缓存 local_path 的文件名和所在目录，运行插件时直接读取。"""
+        if self._local_path:
+            self._dirname, self._basename = os.path.split(self._local_path)
+        else:
+            self._dirname = self._basename = None
+
+    def local_file_present(self):
+        """本地脚本文件是否存在；结果会缓存，直到 local_path 被重新赋值。"""
+        if self._local_file_present is None:
+            self._local_file_present = bool(self._local_path) and os.path.exists(self._local_path)
+        return self._local_file_present
+
+    def _apply_remote(self, data):
+        """用云端元数据覆盖 _UPDATABLE 中的字段。"""
+        for key in self._UPDATABLE:
+            setattr(self, key, data[key])
+
+    @staticmethod
+    def script_filename_from(data):
+        """元数据中的脚本文件名；缺失、为 None 或空字符串时默认为 "<id>.<script_type>"。"""
+        return data.get('script_filename') or f"{data['id']}.{data['script_type']}"
 
     @classmethod
     def from_dict(cls, data):
-        return cls(
-            id=data['id'],
-            name=data['name'],
-            description=data['description'],
-            version=data['version'],
-            author=data['author'],
-            script_type=data['script_type'],
-            download_url=data['download_url'],
-            script_filename=data.get('script_filename', f"{data['id']}.{data['script_type']}"),
-            expected_args=data.get('expected_args')
-        )
+        return cls(data['id'], data['name'], data['description'], data['version'], data['author'],
+                   data['script_type'], data['download_url'], cls.script_filename_from(data),
+                   data.get('expected_args'))
+
+    @classmethod
+    def from_trusted_db_dict(cls, data):
+        """
+        从本地DB记录创建插件。当前版本的 to_dict_for_db() 写出所有键，不需要默认值；
+        缺键时抛出 KeyError，调用方应退回 from_dict()。
+        """
+        return cls(data['id'], data['name'], data['description'], data['version'], data['author'],
+                   data['script_type'], data['download_url'], data['script_filename'], data['expected_args'])
 
     def to_dict_for_db(self):
         """用于存储到本地DB的表示"""
@@ -60,11 +266,23 @@ class Plugin:
 
 
 class PluginManager:
-    def __init__(self, cloud_connector, local_plugins_dir="plugins"):
+    def __init__(self, cloud_connector, local_plugins_dir="plugins", auto_save=True):
+        """
+        :param auto_save: 为 False 时状态变化只标记为待保存，由调用方（例如界面的后台定时保存）调用 flush() 写盘
+        """
         self.cloud_connector = cloud_connector
         self.local_plugins_dir = local_plugins_dir
         self.available_plugins = {}  # plugin_id -> Plugin object
-        self.local_db_path = os.path.join(self.local_plugins_dir, LOCAL_PLUGIN_DB_FILE)
+        self._sorted_plugins = None  # 按名称排序的插件列表缓存，增加插件或改名时置为 None
+        self._path_prefix = os.path.join(self.local_plugins_dir, '')  # 带结尾分隔符，拼接插件路径时直接相加
+        self.local_db_path = self._path_prefix + LOCAL_PLUGIN_DB_FILE
+        self._db_lock = threading.Lock()  # 下载/运行任务可能在不同线程中同时保存DB
+        self._plugins_lock = threading.Lock()  # 保护 available_plugins 的增删与遍历快照
+        self._dirty = False  # 有尚未写入本地DB的状态变化（由 flush() 或界面的定时保存写入）
+        self._batch_depth = 0  # batch() 的嵌套层数，大于0时 _mark_dirty() 不立即保存
+        self.auto_save = auto_save
+        self._last_saved_hash = None  # 本实例上次读到/写入的DB内容哈希，内容不变时跳过写盘
+        self._last_saved_stat = None  # 同时记录的 (st_mtime_ns, st_size)；文件被其他实例改写后不再跳过
 
         if not os.path.exists(self.local_plugins_dir):
             os.makedirs(self.local_plugins_dir)
@@ -74,13 +292,28 @@ class PluginManager:
     def _load_local_plugin_db(self):
         try:
             if os.path.exists(self.local_db_path):
-                with open(self.local_db_path, 'r') as f:
-                    local_plugins_data = json.load(f)
+                st = os.stat(self.local_db_path)
+                stat_key = (st.st_mtime_ns, st.st_size)
+                cached = _DB_CACHE.get(self.local_db_path)
+                self._last_saved_stat = stat_key
+                if cached is not None and cached[0] == stat_key:
+                    local_plugins_data, self._last_saved_hash = cached[1], cached[2]
+                else:
+                    with open(self.local_db_path, 'rb') as f:
+                        raw = f.read()
+                    local_plugins_data = _json_loads(raw)
+                    self._last_saved_hash = _payload_hash(raw)
+                    _DB_CACHE[self.local_db_path] = (stat_key, local_plugins_data, self._last_saved_hash)
+                existing_files = self._existing_script_files()
                 for plugin_id, data in local_plugins_data.items():
-                    plugin = Plugin.from_dict(data)  # 使用原始元数据创建
+                    try:
+                        plugin = Plugin.from_trusted_db_dict(data)  # 使用原始元数据创建
+                    except KeyError:  # 旧版本写出或手工编辑的记录可能缺少部分键
+                        plugin = Plugin.from_dict(data)
                     plugin.local_path = data.get('local_path')
                     plugin.is_downloaded = data.get('is_downloaded', False)
-                    if plugin.is_downloaded and plugin.local_path and os.path.exists(plugin.local_path):
+                    if plugin.is_downloaded and plugin.local_path and \
+                            self._plugin_file_exists(plugin, existing_files):
                         plugin.status_message = "Downloaded"
                     else:  # 如果记录存在但文件丢失，标记为未下载
                         plugin.is_downloaded = False
@@ -91,24 +324,99 @@ class PluginManager:
         except Exception as e:
             print(f"Error loading local plugin DB: {e}")
             self.available_plugins = {}  # 出错则清空
+        self._sorted_plugins = None
+
+    def _existing_script_files(self):
+        """
+        一次 scandir 取得插件目录中所有文件名，代替逐个插件 stat。
+        目录无法读取（OSError）时返回空集合，目录内的插件都按文件缺失处理，与逐个 os.path.exists 的结果一致。
+        """
+        try:
+            with os.scandir(self.local_plugins_dir) as entries:
+                return {entry.name for entry in entries if entry.is_file()}
+        except OSError:
+            return set()
+
+    def _plugin_file_exists(self, plugin, existing_files):
+        """
+        插件目录内的文件查 existing_files 快照；目录外的路径才单独 stat。
+        结果同时写入插件的 local_file_present() 缓存，界面随后读取时无需再 stat。
+        """
+        if plugin._dirname == self.local_plugins_dir:
+            exists = plugin._basename in existing_files
+        else:
+            exists = os.path.exists(plugin.local_path)
+        plugin._local_file_present = exists
+        return exists
 
     def _save_local_plugin_db(self):
-        data_to_save = {}
-        for plugin_id, plugin_obj in self.available_plugins.items():
-            data_to_save[plugin_id] = plugin_obj.to_dict_for_db()
+        tmp_path = self.local_db_path + ".tmp"
+        # 清除脏标记、取快照、序列化和写盘都在同一把锁内完成：
+        # 否则两个线程同时保存时，较早取得的快照可能覆盖较新的DB，且脏标记已被清除
+        with self._db_lock:
+            try:
+                self._dirty = False
+                data_to_save = {}
+                # 复制一份再遍历：保存可能在后台线程进行，同时界面线程可能在添加插件
+                with self._plugins_lock:
+                    plugins = list(self.available_plugins.items())
+                for plugin_id, plugin_obj in plugins:
+                    data_to_save[plugin_id] = plugin_obj.to_dict_for_db()
+                payload = _json_dumps_bytes(data_to_save)  # 先在内存中完整序列化，失败时不会留下半个文件
+                payload_hash = _payload_hash(payload)
+                # 内容与本实例上次读写的一致（例如只改了 status_message），且文件此后未被改写时才跳过
+                if payload_hash == self._last_saved_hash and self._db_file_stat() == self._last_saved_stat:
+                    return
+                # 先写临时文件并落盘，再原子替换，保存中途崩溃不会损坏原有DB
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.local_db_path)
+                self._last_saved_hash = payload_hash
+                self._last_saved_stat = self._db_file_stat()
+            except Exception as e:
+                self._dirty = True
+                print(f"Error saving local plugin DB: {e}")
+                return
+        print("Saved local plugin DB.")
+
+    def _db_file_stat(self):
+        """本地DB文件当前的 (st_mtime_ns, st_size)；文件不存在时为 None。"""
         try:
-            with open(self.local_db_path, 'w') as f:
-                json.dump(data_to_save, f, indent=4)
-            print("Saved local plugin DB.")
-        except Exception as e:
-            print(f"Error saving local plugin DB: {e}")
+            st = os.stat(self.local_db_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def flush(self):
+        """如果有未保存的状态变化，立即写入本地DB。"""
+        if self._dirty:
+            self._save_local_plugin_db()
+
+    def _mark_dirty(self):
+        """记录状态变化；auto_save 开启且不在 batch() 中时立即保存。"""
+        self._dirty = True
+        if self.auto_save and self._batch_depth == 0:
+            self._save_local_plugin_db()
+
+    @contextmanager
+    def batch(self):
+        """批量操作期间推迟保存，退出时（如有变化且 auto_save 开启）只写一次DB。可嵌套。"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self.auto_save and self._batch_depth == 0:
+                self.flush()
 
     def discover_plugins(self):
         print("Discovering plugins...")
         remote_plugin_data_list = self.cloud_connector.fetch_plugin_list()
         if remote_plugin_data_list is None:
             print("Failed to fetch plugin list from cloud.")
-            self._save_local_plugin_db()  # Still save to update any local status changes
+            self._mark_dirty()  # Still save to update any local status changes
             return list(self.available_plugins.values())
 
         newly_discovered_count = 0
@@ -116,48 +424,66 @@ class PluginManager:
 
         # remote_ids = {p_data['id'] for p_data in remote_plugin_data_list} # For removing old ones
 
-        for plugin_data in remote_plugin_data_list:
-            plugin_id = plugin_data['id']
-            if plugin_id in self.available_plugins:
-                existing_plugin = self.available_plugins[plugin_id]
-                # Update all relevant fields from cloud
-                existing_plugin.name = plugin_data['name']
-                existing_plugin.description = plugin_data['description']
-                existing_plugin.version = plugin_data['version']
-                existing_plugin.author = plugin_data['author']
-                existing_plugin.script_type = plugin_data['script_type']
-                existing_plugin.download_url = plugin_data['download_url']
-                new_script_filename = plugin_data.get('script_filename', f"{plugin_id}.{plugin_data['script_type']}")
-                existing_plugin.expected_args = plugin_data.get('expected_args', [])  # Update expected_args
-
-                # If script filename changed, existing local_path might be invalid
-                if existing_plugin.script_filename != new_script_filename and existing_plugin.is_downloaded:
-                    print(f"Script filename changed for {existing_plugin.name}. Marking as not downloaded.")
-                    existing_plugin.is_downloaded = False
-                    existing_plugin.local_path = None  # Old path is no longer valid for this metadata
-                    existing_plugin.status_message = "Available (filename changed)"
-                existing_plugin.script_filename = new_script_filename
-
-                # Verify downloaded file still exists if marked as downloaded
-                if existing_plugin.is_downloaded:
-                    if not existing_plugin.local_path or not os.path.exists(existing_plugin.local_path):
-                        existing_plugin.is_downloaded = False
-                        existing_plugin.local_path = None
-                        existing_plugin.status_message = "Available (file missing)"
-                updated_count += 1
-            else:
-                plugin = Plugin.from_dict(plugin_data)
-                self.available_plugins[plugin_id] = plugin
-                newly_discovered_count += 1
+        existing_files = self._existing_script_files()
+        with self.batch():  # 循环内的状态变化只在结束时写一次DB
+            for plugin_data in remote_plugin_data_list:
+                plugin_id = plugin_data['id']
+                meta_hash = _metadata_hash(plugin_data)
+                if plugin_id in self.available_plugins:
+                    existing_plugin = self.available_plugins[plugin_id]
+                    if existing_plugin._meta_hash != meta_hash:
+                        self._apply_remote_metadata(existing_plugin, plugin_data)
+                        existing_plugin._meta_hash = meta_hash
+                        self._mark_dirty()
+                        updated_count += 1
+
+                    # Verify downloaded file still exists if marked as downloaded
+                    if existing_plugin.is_downloaded:
+                        if not existing_plugin.local_path or \
+                                not self._plugin_file_exists(existing_plugin, existing_files):
+                            existing_plugin.is_downloaded = False
+                            existing_plugin.local_path = None
+                            existing_plugin.status_message = "Available (file missing)"
+                            self._mark_dirty()
+                else:
+                    plugin = Plugin.from_dict(plugin_data)
+                    plugin._meta_hash = meta_hash
+                    with self._plugins_lock:
+                        self.available_plugins[plugin_id] = plugin
+                    self._sorted_plugins = None
+                    self._mark_dirty()
+                    newly_discovered_count += 1
 
         if newly_discovered_count > 0:
             print(f"Discovered {newly_discovered_count} new plugins from cloud.")
         if updated_count > 0:
             print(f"Updated metadata for {updated_count} existing plugins.")
 
-        self._save_local_plugin_db()
         return list(self.available_plugins.values())
 
+    def _apply_remote_metadata(self, existing_plugin, plugin_data):
+        """把云端元数据写到已有的插件对象上。"""
+        # Update all relevant fields from cloud
+        if existing_plugin.name != plugin_data['name']:
+            self._sorted_plugins = None
+        existing_plugin._apply_remote(plugin_data)
+        new_script_filename = Plugin.script_filename_from(plugin_data)
+        existing_plugin.expected_args = plugin_data.get('expected_args', [])  # Update expected_args
+
+        # If script filename changed, existing local_path might be invalid
+        if existing_plugin.script_filename != new_script_filename and existing_plugin.is_downloaded:
+            print(f"Script filename changed for {existing_plugin.name}. Marking as not downloaded.")
+            existing_plugin.is_downloaded = False
+            existing_plugin.local_path = None  # Old path is no longer valid for this metadata
+            existing_plugin.status_message = "Available (filename changed)"
+        existing_plugin.script_filename = new_script_filename
+
+    def iter_sorted(self):
+        """按名称顺序遍历所有插件；排序结果会缓存，只在插件增加或改名后重新排序。"""
+        if self._sorted_plugins is None:
+            self._sorted_plugins = sorted(self.available_plugins.values(), key=lambda p: p.name)
+        return iter(self._sorted_plugins)
+
     def get_plugin_by_id(self, plugin_id):
         return self.available_plugins.get(plugin_id)
 
@@ -167,27 +493,72 @@ class PluginManager:
             print(f"Plugin with ID {plugin_id} not found.")
             return False, "Plugin not found"
 
-        expected_local_path = os.path.join(self.local_plugins_dir, plugin.script_filename)
-        if plugin.is_downloaded and plugin.local_path == expected_local_path and os.path.exists(plugin.local_path):
+        prepared = self._prepare_download(plugin)
+        if prepared is None:
+            return True, "Already downloaded"
+        plugin_info_for_download, local_save_path = prepared
+
+        success = self.cloud_connector.download_plugin_script(plugin_info_for_download, local_save_path)
+        return self._finish_download(plugin, local_save_path, success)
+
+    def download_plugins(self, plugin_ids, max_workers=8):
+        """
+        通过 cloud_connector.download_plugins_batch 并发下载多个插件，全部完成后只写一次DB。
+        :param plugin_ids: 插件ID的可迭代对象
+        :param max_workers: 最大并发数
+        :return: 与输入顺序一致的 (success, message) 列表
+        """
+        plugin_ids = list(plugin_ids)
+        # 重复的ID只下载一次：同一保存路径被两个线程同时写入会互相破坏
+        unique_ids = list(dict.fromkeys(plugin_ids))
+        results_by_id = {}
+        pending = []  # (插件ID, 插件, 下载信息, 保存路径)
+        with self.batch():
+            for plugin_id in unique_ids:
+                plugin = self.get_plugin_by_id(plugin_id)
+                if not plugin:
+                    print(f"Plugin with ID {plugin_id} not found.")
+                    results_by_id[plugin_id] = (False, "Plugin not found")
+                    continue
+                prepared = self._prepare_download(plugin)
+                if prepared is None:
+                    results_by_id[plugin_id] = (True, "Already downloaded")
+                    continue
+                pending.append((plugin_id, plugin) + prepared)
+
+            if pending:
+                successes = self.cloud_connector.download_plugins_batch(
+                    [(info, local_save_path) for _, _, info, local_save_path in pending], max_workers)
+                for (plugin_id, plugin, _, local_save_path), success in zip(pending, successes):
+                    results_by_id[plugin_id] = self._finish_download(plugin, local_save_path, success)
+        return [results_by_id[plugin_id] for plugin_id in plugin_ids]
+
+    def _prepare_download(self, plugin):
+        """
+        下载前的检查。
+        :return: 已是最新时返回 None；否则返回 (下载信息, 本地保存路径)
+        """
+        local_save_path = self._path_prefix + plugin.script_filename
+        if plugin.is_downloaded and plugin.local_path == local_save_path and os.path.exists(plugin.local_path):
             print(f"Plugin {plugin.name} already downloaded and file is current.")
             plugin.status_message = "Downloaded"
-            self._save_local_plugin_db()
-            return True, "Already downloaded"
+            self._mark_dirty()
+            return None
 
         plugin.status_message = "Downloading..."
 
-        local_save_path = os.path.join(self.local_plugins_dir, plugin.script_filename)
-
         plugin_info_for_download = {
-            "id": plugin.id, "name": plugin.name, "script_type": plugin.script_type,
+            "id": plugin.id, "name": plugin.name, "script_type": plugin.script_type, "version": plugin.version,
             "download_url": plugin.download_url, "script_filename": plugin.script_filename
         }
+        return plugin_info_for_download, local_save_path
 
-        success = self.cloud_connector.download_plugin_script(plugin_info_for_download, local_save_path)
-
+    def _finish_download(self, plugin, local_save_path, success):
+        """根据下载结果更新插件状态。"""
         if success:
             plugin.local_path = local_save_path
             plugin.is_downloaded = True
+            plugin._executable_set = False  # 新文件的权限需要重新检查
             plugin.status_message = "Downloaded"
             print(f"Plugin {plugin.name} downloaded successfully to {local_save_path}")
         else:
@@ -201,7 +572,7 @@ class PluginManager:
             plugin.is_downloaded = False
             print(f"Failed to download plugin {plugin.name}")
 
-        self._save_local_plugin_db()
+        self._mark_dirty()
         return success, plugin.status_message
 
     def run_plugin(self, plugin_id, output_callback=None, args_for_plugin=None):  # Added args_for_plugin
@@ -213,7 +584,7 @@ class PluginManager:
                 msg = f"Plugin script file missing: {plugin.local_path}. Please re-download."
                 plugin.status_message = "File missing"
                 plugin.is_downloaded = False  # Mark as not properly downloaded
-                self._save_local_plugin_db()
+                self._mark_dirty()
                 return False, msg
             return False, "Plugin not downloaded or file missing."
 
@@ -222,14 +593,14 @@ class PluginManager:
 
         plugin.status_message = "Running..."
 
-        script_filename_only = os.path.basename(plugin.local_path)
-        plugin_dir = os.path.dirname(plugin.local_path)
+        script_filename_only = plugin._basename
+        plugin_dir = plugin._dirname
 
         command = []
         if plugin.script_type == 'py':
             command = [sys.executable, script_filename_only] + args_for_plugin  # Add arguments
         elif plugin.script_type == 'sh':
-            if os.name != 'nt':  # On Unix-like systems
+            if os.name != 'nt' and not plugin._executable_set:  # On Unix-like systems, checked once per download
                 if not os.access(plugin.local_path, os.X_OK):
                     try:
                         os.chmod(plugin.local_path, 0o755)  # Make it executable
@@ -238,12 +609,13 @@ class PluginManager:
                         err_msg = f"Could not make script {script_filename_only} executable: {e}"
                         if output_callback: output_callback(f"ERROR: {err_msg}\n")
                         plugin.status_message = "Execution permission error"
-                        self._save_local_plugin_db()
+                        self._mark_dirty()
                         return False, err_msg
+                plugin._executable_set = True
             command = [f"./{script_filename_only}"] + args_for_plugin  # Add arguments
         else:
             plugin.status_message = "Unsupported script type"
-            self._save_local_plugin_db()
+            self._mark_dirty()
             return False, f"Unsupported script type: {plugin.script_type}"
 
         print(f"Running command: '{' '.join(command)}' in directory: '{plugin_dir}'")
@@ -251,54 +623,29 @@ class PluginManager:
             popen_kwargs = {
                 'stdout': subprocess.PIPE,
                 'stderr': subprocess.PIPE,
-                'stdin': subprocess.PIPE,  # Crucial for sending input, even if not used by all scripts
+                # No input is ever sent, so give the plugin EOF directly instead of a pipe we'd close at once
+                'stdin': subprocess.DEVNULL,
                 'cwd': plugin_dir
             }
-            if sys.version_info >= (3, 7):
-                popen_kwargs['text'] = True
-                popen_kwargs['encoding'] = 'utf-8'  # Be explicit with encoding
-            else:
-                popen_kwargs['universal_newlines'] = True
+            # Pipes stay binary: output is read in chunks and decoded as UTF-8 by _read_process_output()
 
             process = subprocess.Popen(command, **popen_kwargs)
 
-            stdout_str = ""
-            stderr_str = ""
-
-            # --- Handling stdin ---
-            # For scripts that might need immediate input (e.g. Python's input() called early)
-            # If we have specific input to send, we'd do it here via process.stdin.write()
-            # For general interactive input, it's complex.
-            # For now, we'll just close stdin if no specific input is provided.
-            # This tells the script there's no more input coming from this pipe.
-            # If a script truly needs interactive input, this setup will likely make it hang or error.
-            process.stdin.close()  # Close stdin to signal no input, unless we plan to send some.
-
             if output_callback:
                 output_callback(f"--- Running {plugin.name} ---\n")
+                handle_stdout = output_callback
+                handle_stderr = lambda line: output_callback(f"ERROR: {line}")
+            else:
+                handle_stdout = handle_stderr = None  # No callback: just collect the bytes
 
-                # Read stdout (non-blocking or in threads for true simultaneous read with stderr)
-                for line in iter(process.stdout.readline, ''):
-                    stdout_str += line
-                    if output_callback: output_callback(line)
-
-                # Read stderr
-                for line in iter(process.stderr.readline, ''):
-                    stderr_str += line
-                    if output_callback: output_callback(f"ERROR: {line}")
+            # Drain stdout and stderr together so neither pipe can fill up and block the plugin
+            stdout_buf, stderr_buf = _read_process_output(process, handle_stdout, handle_stderr)
 
             # Wait for process to complete and get return code
             return_code = process.wait()
-
-            # If no callback, read any remaining output after wait() (though iter should get most)
-            if not output_callback:
-                # communicate() after iter and wait can be problematic.
-                # It's better to rely on what iter captured or what process.stdout.read() would give.
-                # For simplicity, if no callback, we'll assume iter captured enough for debug.
-                # stdout_final, stderr_final = process.communicate() # This would be if iter wasn't used.
-                # stdout_str += stdout_final if stdout_final else ""
-                # stderr_str += stderr_final if stderr_final else ""
-                pass  # stdout_str and stderr_str will hold what iter got (which is nothing if no callback)
+            # Decode the full output once, not per line
+            stdout_str = stdout_buf.decode('utf-8', 'replace')
+            stderr_str = stderr_buf.decode('utf-8', 'replace')
 
             if return_code == 0:
                 plugin.status_message = "Run successful"
@@ -344,5 +691,4 @@ class PluginManager:
                     process.stdout.close()
                 if process.stderr and not process.stderr.closed:
                     process.stderr.close()
-                # stdin was closed earlier
-            self._save_local_plugin_db()
\ No newline at end of file
+                # stdin is /dev/null, nothing to close
\ No newline at end of file
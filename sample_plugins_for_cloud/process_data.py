@@ -2,6 +2,7 @@ import sys
 import argparse
 import time
 import os
+import traceback
 
 print("Process Data Plugin Started.")
 print(f"Arguments received by script: {sys.argv}")  # sys.argv[0] is the script name
@@ -58,8 +59,6 @@ except SystemExit as e:  # Argparse calls sys.exit on --help or error
     # sys.exit(e.code if e.code is not None else 1) # Propagate exit code if needed
 except Exception as e:
     print(f"Error in process_data.py: {e}")
-    import traceback
-
     traceback.print_exc()
     sys.exit(1)  # Indicate failure
 